@@ -1,7 +1,9 @@
 from flask import Flask
-from geosuggest.geodb import GeoDB
-from .api.blueprints import base, suggestions
-from .api.errors import InvalidQuery
+from geosuggest.geodb import GeoDB, PartitionedGeoDB, db
+from geosuggest.querylog import QueryLog
+from .api.blueprints import base, suggestions, cities
+from .api.errors import InvalidQuery, handle_invalid_query
+from .api.responses import ResponseCache
 from .config import *
 
 
@@ -23,8 +25,25 @@ def create_app(testing=False, additional_config=None):
     if additional_config:
         app.config.from_mapping(additional_config)
 
+    # Enable the query log if a destination file was configured
+    if app.config.get('QUERY_LOG_PATH'):
+        app.extensions['query_log'] = QueryLog(app.config['QUERY_LOG_PATH'],
+                                               max_bytes=app.config['QUERY_LOG_MAX_BYTES'],
+                                               backup_count=app.config['QUERY_LOG_BACKUP_COUNT'])
+
+    # Apply the memory budget and load the warm-up partitions if the data is partitioned per country
+    if isinstance(db, PartitionedGeoDB):
+        db.configure(memory_budget=app.config['PARTITION_MEMORY_BUDGET'], warm_up=app.config['PARTITION_WARMUP'])
+
+    # Materialized responses, shared by all requests handled by this app instance
+    app.extensions['response_cache'] = ResponseCache(app.config['RESPONSE_CACHE_SIZE'])
+
+    # Invalid queries are reported as JSON by every blueprint
+    app.register_error_handler(InvalidQuery, handle_invalid_query)
+
     # Register our API blueprints
     app.register_blueprint(base.bp)
     app.register_blueprint(suggestions.bp)
+    app.register_blueprint(cities.bp)
 
     return app
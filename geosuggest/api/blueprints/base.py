@@ -1,8 +1,11 @@
 from flask import Blueprint, render_template
+from ..responses import cached_body, encoded_response
 
 bp = Blueprint('geosuggest', __name__)
 
 
 @bp.route('/')
 def index():
-    return render_template('home.html', title='Home')
+    # The home page is static, render it once and serve it from the response cache afterwards
+    entry = cached_body(('index',), lambda: render_template('home.html', title='Home'), mimetype='text/html')
+    return encoded_response(entry)
@@ -0,0 +1,22 @@
+from http import HTTPStatus
+from flask import Blueprint, jsonify
+from ..errors import InvalidQuery
+from ..controllers import CityController
+from ..responses import cached_body, encoded_response
+
+bp = Blueprint('cities', __name__, url_prefix='/cities')
+
+
+# Details of a single city, including the extended fields not returned by /suggestions
+# Usage: GET /cities/<geonameid>
+@bp.route('/<geonameid>', methods=['GET'])
+def city(geonameid: str):
+    # Ids which are not integers can not match any city, report them like unknown ids
+    try:
+        geonameid = int(geonameid)
+    except ValueError:
+        raise InvalidQuery("No city with GeoName ID {id}".format(id=geonameid), status_code=HTTPStatus.NOT_FOUND)
+
+    entry = cached_body(('cities', geonameid), lambda: jsonify(CityController.get_city(geonameid)).get_data(),
+                        mimetype='application/json')
+    return encoded_response(entry)
@@ -1,18 +1,11 @@
-from flask import Blueprint, request, jsonify, render_template
+from flask import Blueprint, request, jsonify, render_template, current_app
 from ..errors import InvalidQuery
 from ..controllers import SuggestionController
+from ..responses import cached_body, encoded_response
 
 bp = Blueprint('suggestions', __name__, url_prefix='/suggestions')
 
 
-# Handler for invalid queries
-@bp.errorhandler(InvalidQuery)
-def handle_invalid_query(error):
-    response = jsonify(error.to_dict())
-    response.status_code = error.status_code
-    return response
-
-
 # Sanitize parameters received from user (validate and clean input)
 def sanitize_suggestions_parameters(req):
     # Get required and optional arguments from query
@@ -20,6 +13,9 @@ def sanitize_suggestions_parameters(req):
     latitude = req.args.get('latitude')
     longitude = req.args.get('longitude')
     viz = req.args.get('visualize')
+    country = req.args.get('country')
+    admin1 = req.args.get('admin1')
+    min_population = req.args.get('min_population')
 
     # Validate required paramters and parameter combinations
     if place is None:
@@ -55,24 +51,64 @@ def sanitize_suggestions_parameters(req):
     else:
         viz = False
 
-    return place, latitude, longitude, viz
+    # Validate the optional facet filters, codes are matched case-insensitively
+    if country is not None:
+        country = country.strip().upper()
+        if not (len(country) == 2 and country.isalpha()):
+            raise InvalidQuery("The 'country' parameter must be an ISO-3166 2-letter country code.")
+    if admin1 is not None:
+        admin1 = admin1.strip().upper()
+        if not (0 < len(admin1) <= 20 and admin1.isalnum()):
+            raise InvalidQuery("The 'admin1' parameter must be an alphanumeric code of at most 20 characters.")
+    if min_population is not None:
+        try:
+            min_population = int(min_population)
+        except ValueError:
+            raise InvalidQuery("The 'min_population' parameter must be an integer.")
+        if min_population < 0:
+            raise InvalidQuery("The 'min_population' parameter can not be negative.")
+
+    filters = {
+        'country': country,
+        'admin1': admin1,
+        'min_population': min_population
+    }
+
+    return place, latitude, longitude, viz, filters
 
 
 # Main route for suggestions
 # Required: q
-# Optional: latitude, longitude & viz
+# Optional: latitude, longitude, viz, country, admin1 & min_population
 # Usage: GET /suggestions?q=<search_term>&latitude=<float>&longitude=<float>&viz=<truthy/falsy>
+#            &country=<CC>&admin1=<code>&min_population=<int>
 @bp.route('/', methods=['GET'])
 def suggest():
     # First, sanitize user input
-    place, latitude, longitude, viz = sanitize_suggestions_parameters(request)
+    place, latitude, longitude, viz, filters = sanitize_suggestions_parameters(request)
 
-    # Get results from our controller
-    result = SuggestionController.get_suggestions(place, latitude, longitude)
+    # Results only depend on the sanitized parameters, so identical queries are served from the response cache,
+    # skipping scoring, serialization and compression
+    key = ('suggestions', place, latitude, longitude, viz, filters['country'], filters['admin1'],
+           filters['min_population'])
 
     # Render the visualization template if the user wishes to see our nice map, else return boring JSON
     if viz:
-        return render_template('visualize.html', title='Visualization',
-                               markers=result, search_term=place, latitude=latitude, longitude=longitude)
+        def render():
+            result = SuggestionController.get_suggestions(place, latitude, longitude, **filters)
+            return render_template('visualize.html', title='Visualization',
+                                   markers=result, search_term=place, latitude=latitude, longitude=longitude)
+        entry = cached_body(key, render, mimetype='text/html')
     else:
-        return jsonify(suggestions=result)
+        def render():
+            result = SuggestionController.get_suggestions(place, latitude, longitude, **filters)
+            return jsonify(suggestions=result).get_data()
+        entry = cached_body(key, render, mimetype='application/json')
+
+    # Record the query for later replay, if the query log is enabled. Only queries which the controller accepted are
+    # recorded, so the log does not replay rejected search terms as valid traffic
+    query_log = current_app.extensions.get('query_log')
+    if query_log is not None:
+        query_log.record(place, latitude, longitude, **filters)
+
+    return encoded_response(entry)
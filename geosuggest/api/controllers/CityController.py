@@ -0,0 +1,11 @@
+from http import HTTPStatus
+from geosuggest.geodb import db
+from ..errors import InvalidQuery
+
+
+def get_city(geonameid: int) -> dict:
+    # Find the record and decode its extended fields, which are not kept in memory
+    record = db.find_by_id(geonameid)
+    if record is None:
+        raise InvalidQuery("No city with GeoName ID {id}".format(id=geonameid), status_code=HTTPStatus.NOT_FOUND)
+    return {**record.to_dict(simple=False), "name": record.display_name()}
@@ -2,9 +2,11 @@ from geosuggest.geodb import db
 from . import ScoreController
 
 
-def get_suggestions(place: str, latitude: float = None, longitude: float = None):
-    # Find potential candidates and calculate their score
-    candidates = db.find_by_name(place)
+def get_suggestions(place: str, latitude: float = None, longitude: float = None, country: str = None,
+                    admin1: str = None, min_population: int = None):
+    # Find potential candidates, restricted to the requested facets, and calculate their score
+    candidates = db.find_by_name(place, country=country, admin1=admin1, min_population=min_population,
+                                 latitude=latitude, longitude=longitude)
     suggestions = sorted(ScoreController.evaluate(place, candidates, latitude, longitude), key=lambda sugg: sugg['score'],
                          reverse=True)
     return suggestions
@@ -1,4 +1,5 @@
 from http import HTTPStatus
+from flask import jsonify
 
 
 # Custom exception for invalid queries
@@ -18,3 +19,10 @@ class InvalidQuery(Exception):
         result['status_code'] = self.status_code
         result['message'] = self.message
         return result
+
+
+# Handler for invalid queries, registered for the whole app in create_app
+def handle_invalid_query(error):
+    response = jsonify(error.to_dict())
+    response.status_code = error.status_code
+    return response
@@ -0,0 +1,101 @@
+from collections import OrderedDict
+from flask import Response, current_app, request
+import threading
+import gzip
+
+# Brotli is optional, responses are only gzip compressed when it is not installed
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# Returns the content codings we can produce, by order of preference
+def available_encodings() -> [str]:
+    return (['br'] if brotli is not None else []) + ['gzip']
+
+
+# Compresses a body with the given content coding, using the levels set in the app configuration
+def compress(body: bytes, encoding: str, config) -> bytes:
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=config['COMPRESSION_GZIP_LEVEL'], mtime=0)
+    if encoding == 'br' and brotli is not None:
+        return brotli.compress(body, quality=config['COMPRESSION_BROTLI_QUALITY'])
+    raise ValueError("Unsupported content coding: {encoding}".format(encoding=encoding))
+
+
+# Returns the best content coding accepted by the client for a body of the given size, or None to send it as is
+def negotiate_encoding(req, body_size: int, config):
+    if not config['COMPRESSION_ENABLED'] or body_size < config['COMPRESSION_MIN_SIZE']:
+        return None
+    return req.accept_encodings.best_match(available_encodings())
+
+
+# An EncodedBody holds a serialized response body along with the compressed variants produced so far,
+# so that a cached response is serialized and compressed at most once per content coding
+class EncodedBody:
+    def __init__(self, body: bytes, mimetype: str):
+        self.body = body
+        self.mimetype = mimetype
+        self.variants = {}
+
+    def encoded(self, encoding: str, config) -> bytes:
+        variant = self.variants.get(encoding)
+        if variant is None:
+            variant = compress(self.body, encoding, config)
+            self.variants[encoding] = variant
+        return variant
+
+
+# A bounded, least recently used cache of EncodedBody, shared by the worker threads of an app.
+# A max_size of 0 disables caching.
+class ResponseCache:
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry: EncodedBody):
+        if self.max_size <= 0:
+            return
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+# Returns the cached body for the given key, materializing it with 'render' on a miss.
+# 'render' must return the uncompressed body as str or bytes
+def cached_body(key, render, mimetype: str) -> EncodedBody:
+    cache = current_app.extensions['response_cache']
+    entry = cache.get(key)
+    if entry is None:
+        body = render()
+        entry = EncodedBody(body.encode('utf8') if isinstance(body, str) else body, mimetype)
+        cache.put(key, entry)
+    return entry
+
+
+# Builds the response for a body, compressed with the best content coding accepted by the client
+def encoded_response(entry: EncodedBody) -> Response:
+    config = current_app.config
+    encoding = negotiate_encoding(request, len(entry.body), config)
+
+    response = Response(entry.encoded(encoding, config) if encoding else entry.body, mimetype=entry.mimetype)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    if config['COMPRESSION_ENABLED']:
+        response.vary.add('Accept-Encoding')
+    return response
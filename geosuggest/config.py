@@ -5,6 +5,26 @@ class Config(object):
     DEBUG = False
     TESTING = False
 
+    # Opt-in log of the queries received on /suggestions, used to replay real traffic (see geosuggest.replay)
+    QUERY_LOG_PATH = os.environ.get('QUERY_LOG_PATH')
+    QUERY_LOG_MAX_BYTES = int(os.environ.get('QUERY_LOG_MAX_BYTES', 10 * 1024 * 1024))
+    QUERY_LOG_BACKUP_COUNT = int(os.environ.get('QUERY_LOG_BACKUP_COUNT', 5))
+
+    # Content negotiated compression of responses. Bodies smaller than COMPRESSION_MIN_SIZE bytes are sent as is
+    COMPRESSION_ENABLED = True
+    COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 500))
+    COMPRESSION_GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL', 6))
+    COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', 5))
+
+    # Number of materialized responses (with their compressed variants) kept in memory, 0 to disable
+    RESPONSE_CACHE_SIZE = int(os.environ.get('RESPONSE_CACHE_SIZE', 1024))
+
+    # Only used when serving per-country partitions (DATA_PARTITION_DIR). The budget is the total size, in bytes, of
+    # the partition files kept loaded (0 for no limit), the warm-up list is a comma separated list of country codes
+    PARTITION_MEMORY_BUDGET = int(os.environ.get('PARTITION_MEMORY_BUDGET', 0))
+    PARTITION_WARMUP = [code.strip().upper() for code in os.environ.get('PARTITION_WARMUP', '').split(',')
+                        if len(code.strip()) > 0]
+
 
 class ProductionConfig(Config):
     @property
@@ -23,3 +43,4 @@ class DevelopmentConfig(Config):
 class TestingConfig(Config):
     TESTING = True
     SECRET_KEY = 'test'
+    QUERY_LOG_PATH = None
@@ -1,5 +1,10 @@
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
 from datetime import datetime
 from .api.errors import InvalidQuery
+import threading
+import json
 import os
 import re
 import csv
@@ -50,34 +55,93 @@ def match_in_list(items, match_pattern):
     return None
 
 
+# Compiles the regex pattern used to match names against a user supplied prefix.
+# Raises an InvalidQuery if nothing is left once the prefix is cleaned
+def prefix_pattern(prefix: str):
+    prefix = prefix.strip()
+    regex_characters = ['*', '.', '[', ']', '\\', '/']
+    clean = ''.join(c for c in prefix if c.isalnum() or c not in regex_characters)
+
+    if len(clean) == 0:
+        raise InvalidQuery("{prefix} is not a valid search term".format(prefix=prefix))
+
+    try:
+        return re.compile(clean, re.IGNORECASE)
+    except re.error:
+        raise InvalidQuery("{prefix} is not a valid search term".format(prefix=clean))
+
+
+# Decodes the fields of a TSV row which are not needed to match and score suggestions.
+# They are only decoded when a record's details are requested, see GeoRecord.cold_fields
+def decode_cold_fields(row) -> dict:
+    return {
+        "feature_class": data_or_none(row, field='feat_class'),
+        "feature_code": data_or_none(row, field='feat_code'),
+        "alternate_country_codes": data_or_none(row, field='cc2', split_on=','),
+        "admin2": data_or_none(row, field='admin2'),
+        "admin3": data_or_none(row, field='admin3'),
+        "admin4": data_or_none(row, field='admin4'),
+        "elevation": data_or_none(row, field='elevation', as_type=int),
+        "digital_elevation_model": data_or_none(row, field='dem', as_type=int),
+        "timezone": data_or_none(row, field='tz'),
+        "modification_date": datetime.strptime(data_or_none(row, field='modified_at'), '%Y-%m-%d').isoformat()
+        if len(row.get('modified_at', '')) > 0 else None
+    }
+
+
+# Returns a read-only property for one of the cold fields of a GeoRecord
+def cold_field(name: str):
+    return property(lambda self: self.cold_fields()[name], doc="Cold field '{name}', decoded on access".format(name=name))
+
+
 # A GeoRecord is an object representing the data contained in a row of the GeoName TSV dump.
+# Only the fields used to match and score suggestions are kept in memory. When the record comes from a GeoDB, the
+# other fields are kept as the byte offset of the row in the source file, and decoded only when requested.
 class GeoRecord:
-    def __init__(self, row):
+    __slots__ = ('geonameid', 'name', 'ascii_name', 'alternate_names', 'latitude', 'longitude', 'country', 'admin1',
+                 'population', 'matched_on', '_source', '_offset', '_row')
+
+    def __init__(self, row, source=None, offset: int = None):
+        self.geonameid = int(row['id'])
         self.name = data_or_none(row, field='name')
         self.ascii_name = data_or_none(row, field='ascii')
         self.alternate_names = data_or_none(row, field='alt_name', split_on=',')
         self.latitude = data_or_none(row, field='lat', as_type=float)
         self.longitude = data_or_none(row, field='long', as_type=float)
-        self.feature_class = data_or_none(row, field='feat_class')
-        self.feature_code = data_or_none(row, field='feat_code')
         self.country = data_or_none(row, field='country')
-        self.alternate_country_codes = data_or_none(row, field='cc2', split_on=',')
         self.admin1 = fips_to_iso(int(data_or_none(row, field='admin1'))) if self.country == "CA" else data_or_none(row, field='admin1')
-        self.admin2 = data_or_none(row, field='admin2')
-        self.admin3 = data_or_none(row, field='admin3')
-        self.admin4 = data_or_none(row, field='admin4')
         self.population = data_or_none(row, field='population', as_type=int)
-        self.elevation = data_or_none(row, field='elevation', as_type=int)
-        self.digital_elevation_model = data_or_none(row, field='dem', as_type=int)
-        self.timezone = data_or_none(row, field='tz')
-        self.modification_date = datetime.strptime(data_or_none(row, field='modified_at'), '%Y-%m-%d').isoformat()\
-            if len(row['modified_at']) > 0 else None
         self.matched_on = None
 
+        # Without a source to read the row back from, the raw row is kept as is
+        self._source = source
+        self._offset = offset
+        self._row = row if source is None else None
+
+    feature_class = cold_field('feature_class')
+    feature_code = cold_field('feature_code')
+    alternate_country_codes = cold_field('alternate_country_codes')
+    admin2 = cold_field('admin2')
+    admin3 = cold_field('admin3')
+    admin4 = cold_field('admin4')
+    elevation = cold_field('elevation')
+    digital_elevation_model = cold_field('digital_elevation_model')
+    timezone = cold_field('timezone')
+    modification_date = cold_field('modification_date')
+
+    # Reads the record's row back from its source and decodes the fields which are not kept in memory
+    def cold_fields(self) -> dict:
+        row = self._row if self._source is None else self._source.read_row(self._offset)
+        return decode_cold_fields(row)
+
     def add_matched_on(self, matched_on_attribute):
         self.matched_on = matched_on_attribute
         return self
 
+    # Returns the name used to disambiguate the record, based on the given name or the record's own name
+    def display_name(self, name: str = None) -> str:
+        return "{name}, {admin1}, {country}".format(name=name or self.name, admin1=self.admin1, country=self.country)
+
     # Returns a dictionary containing the object data.
     # The 'simple' flag controls the level of information contained in the returned dict.
     def to_dict(self, simple: bool) -> dict:
@@ -85,69 +149,134 @@ class GeoRecord:
         name = self.matched_on.title() if self.matched_on is not None else self.name
 
         basic = {
-            "name": "{name}, {admin1}, {country}".format(name=name, admin1=self.admin1, country=self.country),
+            "name": self.display_name(name),
             "latitude": self.latitude,
             "longitude": self.longitude
         }
+        if simple:
+            return basic
+
         extended = {
+            "geonameid": self.geonameid,
             "ascii_name": self.ascii_name,
             "alternate_names": self.alternate_names,
-            "feature_class": self.feature_class,
-            "feature_code": self.feature_code,
             "country": self.country,
-            "alternate_country_codes": self.alternate_country_codes,
             "admin1": self.admin1,
-            "admin2": self.admin2,
-            "admin3": self.admin3,
-            "admin4": self.admin4,
             "population": self.population,
-            "elevation": self.elevation,
-            "digital_elevation_model": self.digital_elevation_model,
-            "timezone": self.timezone,
-            "modification_date": self.modification_date
+            **self.cold_fields()
         }
-        if simple:
-            return basic
-        else:
-            return {**basic, **extended}
+        return {**basic, **extended}
 
 
 # The GeoDB class represents the collection of GeoRecord taken from the TSV file
 class GeoDB:
     def __init__(self, file_path: str, csv_dialect: str = 'excel-tab'):
         self.geo_points = []
+        self.file_path = file_path
+        self.csv_dialect = csv_dialect
 
         if not os.path.exists(file_path):
             raise FileNotFoundError("{path} does not exist".format(path=file_path))
 
-        with open(file_path, encoding='utf8') as file:
-            reader = csv.DictReader(file, dialect=csv_dialect, quoting=csv.QUOTE_NONE)
-            for row in reader:
+        # The file is read as bytes to keep track of the offset of each row, used to decode cold fields on demand
+        with open(file_path, 'rb') as file:
+            self.fieldnames = self.parse_line(file.readline())
+            offset = file.tell()
+            for line in iter(file.readline, b''):
+                row_offset, offset = offset, offset + len(line)
+                if len(line.strip()) == 0:
+                    continue
+                row = self.parse_row(line)
                 try:
-                    self.geo_points.append(GeoRecord(row))
+                    record = GeoRecord(row, source=self, offset=row_offset)
+                    # Cold fields are decoded once and thrown away, so rows with invalid values are still skipped
+                    decode_cold_fields(row)
+                    self.geo_points.append(record)
                 except Exception as e:
                     print(
                         "An error occured while processing geographical point with GeoName ID: {id}. Reason: {message}"
                         .format(id=row['id'], message=str(e)))
 
-    # Finds all candidates based on a given prefix
-    def find_by_name(self, prefix: str):
-        prefix = prefix.strip()
-        regex_characters = ['*', '.', '[', ']', '\\', '/']
-        clean = ''.join(c for c in prefix if c.isalnum() or c not in regex_characters)
+        self.by_id = {point.geonameid: position for position, point in enumerate(self.geo_points)}
+        self.build_facets()
+
+    # Splits a raw line of the source file into its columns
+    def parse_line(self, line: bytes) -> [str]:
+        return next(csv.reader([line.decode('utf8').rstrip('\r\n')], dialect=self.csv_dialect, quoting=csv.QUOTE_NONE))
+
+    # Returns a raw line of the source file as a dictionary keyed on the header's field names
+    def parse_row(self, line: bytes) -> dict:
+        return dict(zip(self.fieldnames, self.parse_line(line)))
+
+    # Reads back the row starting at the given byte offset of the source file
+    def read_row(self, offset: int) -> dict:
+        with open(self.file_path, 'rb') as file:
+            file.seek(offset)
+            return self.parse_row(file.readline())
+
+    # Returns the record with the given GeoName ID, or None if there is no such record
+    def find_by_id(self, geonameid: int):
+        position = self.by_id.get(geonameid)
+        return self.geo_points[position] if position is not None else None
+
+    # Builds, once at load time, the indexes used to filter records on their country, admin1 code and population.
+    # Records are referred to by their position in geo_points.
+    def build_facets(self):
+        by_country = {}
+        by_admin1 = {}
+        for position, point in enumerate(self.geo_points):
+            by_country.setdefault(point.country, set()).add(position)
+            by_admin1.setdefault(point.admin1, set()).add(position)
+        self.country_facet = {country: frozenset(ids) for country, ids in by_country.items()}
+        self.admin1_facet = {admin1: frozenset(ids) for admin1, ids in by_admin1.items()}
+
+        # Population of each record by position, compared against a minimum without sorting anything per query
+        self.populations = [point.population or 0 for point in self.geo_points]
+        self.smallest_population = min(self.populations) if len(self.populations) > 0 else 0
 
-        if len(clean) == 0:
-            raise InvalidQuery("{prefix} is not a valid search term".format(prefix=prefix))
+    # Returns the sorted positions of the records matching every given filter, or None if no filter applies
+    def filter_ids(self, country: str = None, admin1: str = None, min_population: int = None):
+        # A minimum population at or below the smallest one matches every record
+        if min_population is not None and min_population <= self.smallest_population:
+            min_population = None
 
-        try:
-            pattern = re.compile(clean, re.IGNORECASE)
-        except re.error:
-            raise InvalidQuery("{prefix} is not a valid search term".format(prefix=clean))
+        id_sets = []
+        if country is not None:
+            id_sets.append(self.country_facet.get(country, frozenset()))
+        if admin1 is not None:
+            id_sets.append(self.admin1_facet.get(admin1, frozenset()))
 
-        candidates = [point.add_matched_on(point.name) for point in self.geo_points if pattern.match(point.name)]
-        candidates += [point.add_matched_on(point.ascii_name) for point in self.geo_points if pattern.match(point.ascii_name)
+        if len(id_sets) == 0:
+            if min_population is None:
+                return None
+            return [pos for pos, population in enumerate(self.populations) if population >= min_population]
+
+        # Intersect starting from the smallest set to keep the work proportional to the most selective filter
+        id_sets.sort(key=len)
+        ids = set(id_sets[0])
+        for id_set in id_sets[1:]:
+            ids.intersection_update(id_set)
+
+        # The population range is applied last, by checking each remaining record against the minimum
+        if min_population is not None:
+            ids = [pos for pos in ids if self.populations[pos] >= min_population]
+        return sorted(ids)
+
+    # Finds all candidates based on a given prefix, optionally restricted to records matching the given filters.
+    # The coordinates are only used by a PartitionedGeoDB to pick the partitions to search.
+    def find_by_name(self, prefix: str, country: str = None, admin1: str = None, min_population: int = None,
+                     latitude: float = None, longitude: float = None):
+        return self.find_by_pattern(prefix_pattern(prefix), country, admin1, min_population)
+
+    # Finds all candidates whose name, ascii name or an alternate name matches a compiled pattern
+    def find_by_pattern(self, pattern, country: str = None, admin1: str = None, min_population: int = None):
+        ids = self.filter_ids(country, admin1, min_population)
+        points = self.geo_points if ids is None else [self.geo_points[pos] for pos in ids]
+
+        candidates = [point.add_matched_on(point.name) for point in points if pattern.match(point.name)]
+        candidates += [point.add_matched_on(point.ascii_name) for point in points if pattern.match(point.ascii_name)
                        and point not in candidates]
-        for point in self.geo_points:
+        for point in points:
             alt_name_match = match_in_list(point.alternate_names, pattern)
             if alt_name_match is not None:
                 if point not in candidates:
@@ -155,6 +284,156 @@ class GeoDB:
         return candidates
 
 
-# Our main db instance, for demo purposes, used to simplify data access, instead of using an external DB
-db = GeoDB(file_path=os.path.dirname(os.path.abspath(__file__)) + '/data/cities_canada-usa.tsv',
-           csv_dialect='excel-tab')
+# A PartitionedGeoDB serves a directory holding one TSV file per country, as produced by geosuggest.partition.
+# A partition is only loaded and indexed the first time a query needs it. Partitions which are not part of the warm-up
+# list are evicted, least recently used first, when the loaded partitions exceed the memory budget. The budget is
+# expressed as the size of the partition files, a proxy for their resident size.
+class PartitionedGeoDB:
+    manifest_name = 'manifest.json'
+
+    def __init__(self, directory: str, memory_budget: int = None, csv_dialect: str = 'excel-tab'):
+        if not os.path.isdir(directory):
+            raise FileNotFoundError("{path} does not exist".format(path=directory))
+
+        self.directory = directory
+        self.csv_dialect = csv_dialect
+        self.memory_budget = memory_budget
+        self.manifest = self.read_manifest(directory)
+        self.partition_ids = {}
+        self.warm = []
+        self.loaded = OrderedDict()
+        # The lock only guards the bookkeeping of loaded partitions. Partitions are parsed outside of it, under a lock
+        # per country code, so loading a cold partition does not block queries on the partitions already loaded
+        self.lock = threading.Lock()
+        self.loading = {}
+
+    # Reads the partitions description. Without a manifest, every TSV file of the directory is a partition named
+    # after the file, with no known bounding box
+    @classmethod
+    def read_manifest(cls, directory: str) -> dict:
+        manifest_path = os.path.join(directory, cls.manifest_name)
+        if os.path.exists(manifest_path):
+            with open(manifest_path, encoding='utf8') as file:
+                return json.load(file)
+
+        return {os.path.splitext(name)[0].upper(): {'file': name, 'bbox': None,
+                                                    'bytes': os.path.getsize(os.path.join(directory, name))}
+                for name in sorted(os.listdir(directory)) if name.endswith('.tsv')}
+
+    # Sets the memory budget and loads the warm-up partitions, which are never evicted and are the ones searched when
+    # a query gives no hint about its location. Without a warm-up list, such queries search every partition
+    def configure(self, memory_budget: int = None, warm_up: [str] = None):
+        for code in warm_up or []:
+            if code not in self.manifest:
+                print("Unknown partition {code} in the warm-up list".format(code=code))
+        with self.lock:
+            self.memory_budget = memory_budget
+            self.warm = [code for code in (warm_up or []) if code in self.manifest]
+        for code in self.warm:
+            self.partition(code)
+
+    # Returns the loaded partition for a country code, loading it and evicting cold partitions if needed.
+    # Partitions listed in 'keep' are never evicted, so a query does not evict the partitions it is using
+    def partition(self, code: str, keep: [str] = ()) -> GeoDB:
+        partition = self.touch(code)
+        if partition is not None:
+            return partition
+
+        # Only one thread parses a given partition, the others wait for it on the partition's own lock
+        with self.lock:
+            code_lock = self.loading.setdefault(code, threading.Lock())
+        with code_lock:
+            partition = self.touch(code)
+            if partition is not None:
+                return partition
+
+            partition = GeoDB(file_path=os.path.join(self.directory, self.manifest[code]['file']),
+                              csv_dialect=self.csv_dialect)
+            with self.lock:
+                self.loaded[code] = partition
+                self.evict(keep=[code, *keep])
+            return partition
+
+    # Returns a loaded partition and marks it as the most recently used, or None if it is not loaded
+    def touch(self, code: str):
+        with self.lock:
+            partition = self.loaded.get(code)
+            if partition is not None:
+                self.loaded.move_to_end(code)
+            return partition
+
+    # Evicts the least recently used cold partitions until the loaded partitions fit in the memory budget.
+    # Must be called while holding the lock
+    def evict(self, keep: [str] = ()):
+        if not self.memory_budget:
+            return
+        for code in list(self.loaded.keys()):
+            if self.loaded_bytes() <= self.memory_budget:
+                return
+            if code not in self.warm and code not in keep:
+                del self.loaded[code]
+
+    def loaded_bytes(self) -> int:
+        return sum(self.manifest[code]['bytes'] for code in self.loaded)
+
+    # Returns the codes of the partitions a query must search
+    def partitions_for(self, country: str = None, latitude: float = None, longitude: float = None) -> [str]:
+        if country is not None:
+            return [country] if country in self.manifest else []
+
+        codes = list(self.warm) if len(self.warm) > 0 else list(self.manifest.keys())
+        if latitude is not None and longitude is not None:
+            for code, description in self.manifest.items():
+                bbox = description.get('bbox')
+                if code not in codes and bbox and bbox[0] <= latitude <= bbox[2] and bbox[1] <= longitude <= bbox[3]:
+                    codes.append(code)
+        return codes
+
+    # Returns the sorted GeoName IDs of a partition, read from its sidecar file the first time they are needed
+    def ids_of(self, code: str) -> array:
+        ids = self.partition_ids.get(code)
+        if ids is None:
+            with open(os.path.join(self.directory, self.manifest[code]['ids']), encoding='utf8') as file:
+                ids = array('q', sorted(int(line) for line in file if len(line.strip()) > 0))
+            self.partition_ids[code] = ids
+        return ids
+
+    # Returns the record with the given GeoName ID, or None if there is no such record.
+    # Only the ids of the partitions whose id range contains the id are searched, and only the partition holding it is
+    # loaded. Ids which are not indexed (a directory without a manifest) are only searched in the loaded partitions
+    def find_by_id(self, geonameid: int):
+        for code, description in self.manifest.items():
+            if 'ids' not in description or not description['min_id'] <= geonameid <= description['max_id']:
+                continue
+            ids = self.ids_of(code)
+            position = bisect_left(ids, geonameid)
+            if position < len(ids) and ids[position] == geonameid:
+                return self.partition(code).find_by_id(geonameid)
+
+        with self.lock:
+            partitions = list(self.loaded.values())
+        for partition in partitions:
+            record = partition.find_by_id(geonameid)
+            if record is not None:
+                return record
+        return None
+
+    # Finds all candidates based on a given prefix in the partitions needed by the query, see GeoDB.find_by_name
+    def find_by_name(self, prefix: str, country: str = None, admin1: str = None, min_population: int = None,
+                     latitude: float = None, longitude: float = None):
+        pattern = prefix_pattern(prefix)
+        codes = self.partitions_for(country, latitude, longitude)
+
+        candidates = []
+        for code in codes:
+            candidates += self.partition(code, keep=codes).find_by_pattern(pattern, country, admin1, min_population)
+        return candidates
+
+
+# Our main db instance, for demo purposes, used to simplify data access, instead of using an external DB.
+# If DATA_PARTITION_DIR is set, per-country partitions are loaded on demand from that directory instead.
+if os.environ.get('DATA_PARTITION_DIR'):
+    db = PartitionedGeoDB(directory=os.environ['DATA_PARTITION_DIR'], csv_dialect='excel-tab')
+else:
+    db = GeoDB(file_path=os.path.dirname(os.path.abspath(__file__)) + '/data/cities_canada-usa.tsv',
+               csv_dialect='excel-tab')
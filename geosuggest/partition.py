@@ -0,0 +1,94 @@
+from geosuggest.geodb import PartitionedGeoDB
+import argparse
+import json
+import os
+
+
+# Usage: python -m geosuggest.partition <source.tsv> <output_dir>
+# Splits a GeoNames TSV dump into one file per country, along with the manifest used by PartitionedGeoDB
+# (file name, bounding box, size and GeoName ID range of each partition). The sorted GeoName IDs of each partition are
+# written to a sidecar file, only read when looking up an id within the partition's range.
+
+
+# Splits the source file and returns the manifest written in the output directory
+def split_by_country(source_path: str, output_dir: str) -> dict:
+    if not os.path.exists(source_path):
+        raise FileNotFoundError("{path} does not exist".format(path=source_path))
+    os.makedirs(output_dir, exist_ok=True)
+
+    outputs = {}
+    manifest = {}
+    ids = {}
+    try:
+        with open(source_path, encoding='utf8', newline='') as source:
+            header = source.readline()
+            fields = header.rstrip('\r\n').split('\t')
+            id_index, country_index = fields.index('id'), fields.index('country')
+            lat_index, long_index = fields.index('lat'), fields.index('long')
+
+            for line in source:
+                columns = line.rstrip('\r\n').split('\t')
+                code = columns[country_index].upper()
+                if len(code) == 0:
+                    print("Skipping record without a country: {id}".format(id=columns[0]))
+                    continue
+                try:
+                    latitude, longitude = float(columns[lat_index]), float(columns[long_index])
+                except (ValueError, IndexError):
+                    print("Skipping record with invalid coordinates: {id}".format(id=columns[0]))
+                    continue
+                try:
+                    geonameid = int(columns[id_index])
+                except ValueError:
+                    print("Skipping record with an invalid GeoName ID: {id}".format(id=columns[id_index]))
+                    continue
+
+                if code not in outputs:
+                    name = '{code}.tsv'.format(code=code)
+                    outputs[code] = open(os.path.join(output_dir, name), 'w', encoding='utf8', newline='')
+                    outputs[code].write(header)
+                    manifest[code] = {'file': name, 'bbox': None, 'records': 0}
+                    ids[code] = []
+                outputs[code].write(line)
+
+                # Grow the partition bounding box, stored as [min_lat, min_long, max_lat, max_long]
+                bbox = manifest[code]['bbox'] or [latitude, longitude, latitude, longitude]
+                manifest[code]['bbox'] = [min(bbox[0], latitude), min(bbox[1], longitude),
+                                          max(bbox[2], latitude), max(bbox[3], longitude)]
+                manifest[code]['records'] += 1
+
+                # Collect the record's id, so a lookup by id only loads the partition holding it
+                ids[code].append(geonameid)
+    finally:
+        for output in outputs.values():
+            output.close()
+
+    for code, description in manifest.items():
+        description['bytes'] = os.path.getsize(os.path.join(output_dir, description['file']))
+
+        # Only the id range is kept in the manifest, the sorted ids are written to a sidecar file
+        partition_ids = sorted(ids[code])
+        description['ids'] = '{code}.ids'.format(code=code)
+        description['min_id'], description['max_id'] = partition_ids[0], partition_ids[-1]
+        with open(os.path.join(output_dir, description['ids']), 'w', encoding='utf8') as file:
+            file.write(''.join('{id}\n'.format(id=geonameid) for geonameid in partition_ids))
+
+    with open(os.path.join(output_dir, PartitionedGeoDB.manifest_name), 'w', encoding='utf8') as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+
+    return manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Split a GeoNames TSV dump into per-country partitions")
+    parser.add_argument('source', help="path of the TSV dump")
+    parser.add_argument('output', help="directory receiving the partitions and their manifest")
+    args = parser.parse_args(argv)
+
+    for code, description in sorted(split_by_country(args.source, args.output).items()):
+        print("{code}: {records} records, {bytes} bytes".format(code=code, records=description['records'],
+                                                                bytes=description['bytes']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+from logging.handlers import RotatingFileHandler
+import logging
+import time
+import os
+
+
+# Normalizes a search term so it fits on a single line of the log
+def normalize_query(place: str) -> str:
+    return ' '.join(place.split())
+
+
+# Receives a query, its optional coordinates and facet filters, and returns the compact, tab separated line
+# representing it. Missing values are stored as empty fields
+def format_record(timestamp: float, place: str, latitude: float = None, longitude: float = None, country: str = None,
+                  admin1: str = None, min_population: int = None) -> str:
+    return '\t'.join([
+        '%.3f' % timestamp,
+        normalize_query(place),
+        '' if latitude is None else repr(float(latitude)),
+        '' if longitude is None else repr(float(longitude)),
+        country or '',
+        admin1 or '',
+        '' if min_population is None else str(int(min_population))
+    ])
+
+
+# Parses a line produced by format_record back into a
+# (timestamp, q, latitude, longitude, country, admin1, min_population) tuple.
+# Lines written before the facet filters were logged only have the first 4 columns, their filters are None
+def parse_record(line: str):
+    columns = line.rstrip('\r\n').split('\t')
+    if len(columns) == 4:
+        columns += ['', '', '']
+    timestamp, place, latitude, longitude, country, admin1, min_population = columns
+    return (float(timestamp), place,
+            float(latitude) if len(latitude) > 0 else None,
+            float(longitude) if len(longitude) > 0 else None,
+            country if len(country) > 0 else None,
+            admin1 if len(admin1) > 0 else None,
+            int(min_population) if len(min_population) > 0 else None)
+
+
+# Returns the files of a rotated log, oldest first (path.N, ..., path.1, path)
+def rotated_files(path: str) -> [str]:
+    backups = []
+    index = 1
+    while os.path.exists('{path}.{index}'.format(path=path, index=index)):
+        backups.append('{path}.{index}'.format(path=path, index=index))
+        index += 1
+    files = list(reversed(backups))
+    if os.path.exists(path):
+        files.append(path)
+    return files
+
+
+# Reads every record of a (possibly rotated) query log, in chronological order
+def read_query_log(path: str):
+    files = rotated_files(path)
+    if len(files) == 0:
+        raise FileNotFoundError("{path} does not exist".format(path=path))
+
+    for file_path in files:
+        with open(file_path, encoding='utf8') as file:
+            for line in file:
+                if len(line.strip()) == 0:
+                    continue
+                try:
+                    yield parse_record(line)
+                except ValueError:
+                    print("Skipping malformed query log line in {path}: {line}".format(path=file_path, line=line.strip()))
+
+
+# The QueryLog appends normalized suggestion queries to a size-rotated file, to be replayed later on
+class QueryLog:
+    def __init__(self, file_path: str, max_bytes: int = 10 * 1024 * 1024, backup_count: int = 5):
+        self.file_path = file_path
+        self.handler = RotatingFileHandler(file_path, maxBytes=max_bytes, backupCount=backup_count,
+                                           encoding='utf8', delay=True)
+        self.handler.setFormatter(logging.Formatter('%(message)s'))
+
+    # Appends a single query to the log. The handler takes care of locking and rotation
+    def record(self, place: str, latitude: float = None, longitude: float = None, country: str = None,
+               admin1: str = None, min_population: int = None, timestamp: float = None):
+        line = format_record(time.time() if timestamp is None else timestamp, place, latitude, longitude,
+                             country, admin1, min_population)
+        self.handler.handle(logging.makeLogRecord({'msg': line, 'levelno': logging.INFO}))
+
+    def close(self):
+        self.handler.close()
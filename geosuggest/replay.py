@@ -0,0 +1,184 @@
+from urllib.error import HTTPError
+from urllib.parse import urlencode
+from urllib.request import urlopen
+from geosuggest.querylog import read_query_log
+import argparse
+import math
+import queue
+import threading
+import time
+
+
+# Usage: python -m geosuggest.replay <query_log> [--url http://localhost:5000] [--speed 1] [--clients 4]
+# Replays a query log captured on /suggestions, either against the Flask test client (default) or against a
+# running server, and reports throughput and latency percentiles.
+
+
+# Returns the query string parameters of a logged (timestamp, q, latitude, longitude[, country, admin1,
+# min_population]) record
+def record_parameters(record) -> dict:
+    _, place, latitude, longitude, *filters = record
+    params = {'q': place}
+    if latitude is not None and longitude is not None:
+        params['latitude'] = latitude
+        params['longitude'] = longitude
+    for name, value in zip(['country', 'admin1', 'min_population'], filters):
+        if value is not None:
+            params[name] = value
+    return params
+
+
+# Returns a factory of senders driving the Flask app in-process. Each client thread gets its own test client.
+# A sender takes the query parameters and returns the HTTP status code of the response
+def flask_client_senders(app=None):
+    if app is None:
+        from geosuggest import create_app
+        app = create_app(testing=True)
+
+    def make_sender():
+        client = app.test_client()
+
+        def send(params):
+            return client.get('/suggestions/', query_string=params).status_code
+        return send
+
+    return make_sender
+
+
+# Returns a factory of senders driving a server listening on the given base url
+def http_senders(base_url: str, timeout: float = 30):
+    endpoint = base_url.rstrip('/') + '/suggestions/?'
+
+    def make_sender():
+        def send(params):
+            try:
+                with urlopen(endpoint + urlencode(params), timeout=timeout) as response:
+                    response.read()
+                    return response.status
+            except HTTPError as e:
+                return e.code
+        return send
+
+    return make_sender
+
+
+# Returns the nearest-rank percentile of a list of values, or None if the list is empty
+def percentile(values: [float], pct: float):
+    if len(values) == 0:
+        return None
+    ordered = sorted(values)
+    rank = max(int(math.ceil(pct / 100 * len(ordered))), 1)
+    return ordered[rank - 1]
+
+
+# Replays the records using 'clients' concurrent senders.
+# A 'speed' of 1 reproduces the original inter-arrival times, 2 replays twice as fast, and 0 sends every query
+# as soon as a client is available.
+# When replaying at a given speed, latencies are measured from the moment each query was scheduled to be sent, so
+# queries delayed because every client was busy are not omitted from the percentiles. How far behind schedule the
+# queries were sent is reported separately as the lag.
+# Returns a dictionary of statistics about the run
+def replay(records, make_sender, clients: int = 4, speed: float = 1.0) -> dict:
+    records = list(records)
+    if clients < 1:
+        raise ValueError("At least one client is required")
+    if speed < 0:
+        raise ValueError("The replay speed can not be negative")
+
+    pending = queue.Queue()
+    first_timestamp = records[0][0] if len(records) > 0 else 0
+    for record in records:
+        offset = (record[0] - first_timestamp) / speed if speed > 0 else 0
+        pending.put((offset, record))
+
+    latencies = []
+    lags = []
+    errors = []
+    lock = threading.Lock()
+    start = time.perf_counter()
+
+    def worker():
+        send = make_sender()
+        while True:
+            try:
+                offset, record = pending.get_nowait()
+            except queue.Empty:
+                return
+
+            # Wait for the moment the query was originally received, scaled by the replay speed
+            scheduled_at = start + offset
+            delay = scheduled_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+            sent_at = time.perf_counter()
+            if speed == 0:
+                scheduled_at = sent_at
+            try:
+                failed = send(record_parameters(record)) >= 400
+            except Exception as e:
+                print("Query {q} failed. Reason: {message}".format(q=record[1], message=str(e)))
+                failed = True
+            latency = time.perf_counter() - scheduled_at
+
+            with lock:
+                latencies.append(latency)
+                lags.append(sent_at - scheduled_at)
+                if failed:
+                    errors.append(record)
+
+    threads = [threading.Thread(target=worker) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    return {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'elapsed': elapsed,
+        'throughput': len(latencies) / elapsed if elapsed > 0 else 0,
+        'p50': percentile(latencies, 50),
+        'p95': percentile(latencies, 95),
+        'p99': percentile(latencies, 99),
+        'lag_p99': percentile(lags, 99),
+        'lag_max': max(lags) if len(lags) > 0 else None,
+    }
+
+
+# Formats the statistics returned by replay() for the terminal
+def format_report(stats: dict) -> str:
+    def ms(value):
+        return 'n/a' if value is None else '%.2f ms' % (value * 1000)
+
+    return '\n'.join([
+        "requests:   {requests} ({errors} errors)".format(**stats),
+        "elapsed:    %.2f s" % stats['elapsed'],
+        "throughput: %.1f req/s" % stats['throughput'],
+        "latency:    p50 {p50}, p95 {p95}, p99 {p99}".format(p50=ms(stats['p50']), p95=ms(stats['p95']),
+                                                              p99=ms(stats['p99'])),
+        "lag:        p99 {p99}, max {max} behind schedule".format(p99=ms(stats['lag_p99']), max=ms(stats['lag_max'])),
+    ])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a /suggestions query log and report latencies")
+    parser.add_argument('log', help="path of the query log (rotated backups are read as well)")
+    parser.add_argument('--url', help="base url of a running server, the Flask test client is used if omitted")
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help="replay rate relative to the original traffic, 0 to send as fast as possible")
+    parser.add_argument('--clients', type=int, default=4, help="number of concurrent clients")
+    parser.add_argument('--limit', type=int, help="only replay the first LIMIT queries")
+    args = parser.parse_args(argv)
+
+    records = list(read_query_log(args.log))
+    if args.limit is not None:
+        records = records[:args.limit]
+
+    make_sender = http_senders(args.url) if args.url else flask_client_senders()
+    print(format_report(replay(records, make_sender, clients=args.clients, speed=args.speed)))
+
+
+if __name__ == '__main__':
+    main()
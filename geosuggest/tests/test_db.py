@@ -137,3 +137,84 @@ def test_georecord_to_dict_extended(testing_db):
     assert isinstance(record, dict)
     for field in ['name', 'latitude', 'longitude', 'ascii_name', 'population']:
         assert field in record.keys()
+
+
+# Verify that the country filter only returns records from that country
+def test_find_by_name_country_filter(testing_db):
+    candidates = testing_db.find_by_name('A', country='CA')
+    assert len(candidates) > 0
+    assert all(candidate.country == 'CA' for candidate in candidates)
+    assert len(candidates) + len(testing_db.find_by_name('A', country='US')) == len(testing_db.find_by_name('A'))
+
+
+# Verify that the admin1 filter only returns records from that subdivision
+def test_find_by_name_admin1_filter(testing_db):
+    candidates = testing_db.find_by_name('A', country='CA', admin1='QC')
+    assert len(candidates) > 0
+    assert all(candidate.admin1 == 'QC' for candidate in candidates)
+
+
+# Verify that the min_population filter is inclusive and excludes smaller records
+def test_find_by_name_min_population_filter(testing_db):
+    candidates = testing_db.find_by_name('A', min_population=29526)
+    assert len(candidates) > 0
+    assert all(candidate.population >= 29526 for candidate in candidates)
+    assert 'Alma' in [candidate.name for candidate in candidates]
+
+
+# Verify that filters matching nothing return no candidates
+def test_find_by_name_unknown_facet_value(testing_db):
+    assert len(testing_db.find_by_name('A', country='FR')) == 0
+    assert len(testing_db.find_by_name('A', country='US', admin1='QC')) == 0
+
+
+# Verify that records are found by their GeoName ID
+def test_find_by_id(testing_db):
+    record = testing_db.geo_points[0]
+    assert testing_db.find_by_id(record.geonameid) is record
+    assert testing_db.find_by_id(-1) is None
+
+
+# Verify that cold fields are not kept in memory, and are decoded from the source file when requested
+def test_georecord_cold_fields(testing_db):
+    record = testing_db.find_by_id(5881791)
+    assert not hasattr(record, '__dict__')
+    assert record.timezone == 'America/Vancouver'
+    assert record.modification_date == '2013-04-22T00:00:00'
+    assert record.digital_elevation_model == 114
+    assert record.elevation is None
+    assert record.to_dict(simple=False)['admin2'] == '5957659'
+
+
+# Verify that a minimum population at or below the smallest one does not filter anything
+def test_filter_ids_min_population_below_smallest(testing_db):
+    assert testing_db.filter_ids(min_population=0) is None
+    assert testing_db.filter_ids(country='CA', min_population=0) == sorted(testing_db.country_facet['CA'])
+
+
+# Verify that the population range is combined with the other filters
+def test_filter_ids_min_population_with_country(testing_db):
+    ids = testing_db.filter_ids(country='CA', min_population=20000)
+    assert len(ids) > 0
+    assert ids == sorted(ids)
+    assert all(testing_db.geo_points[pos].country == 'CA' and testing_db.geo_points[pos].population >= 20000
+               for pos in ids)
+
+
+# Verify that rows with invalid cold fields are skipped at load time, rather than failing when their details are read
+def test_geodb_skips_invalid_cold_fields(tmp_path):
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test_db_data.tsv'), encoding='utf8') as file:
+        lines = file.readlines()
+    fields = lines[0].rstrip('\n').split('\t')
+    for line_index, field, value in [(1, 'elevation', 'abc'), (2, 'modified_at', '2013/04/22')]:
+        columns = lines[line_index].rstrip('\n').split('\t')
+        columns[fields.index(field)] = value
+        lines[line_index] = '\t'.join(columns) + '\n'
+    path = tmp_path / 'malformed.tsv'
+    path.write_text(''.join(lines), encoding='utf8')
+
+    db = GeoDB(file_path=str(path))
+    assert len(db.geo_points) == len(lines) - 3
+    assert db.find_by_id(5881791) is None
+    for record in db.geo_points:
+        assert isinstance(record.to_dict(simple=False), dict)
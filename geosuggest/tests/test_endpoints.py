@@ -1,3 +1,15 @@
+from geosuggest import create_app
+import pytest
+import gzip
+import json
+
+
+# Fixture for an app instance with compression and the response cache disabled
+@pytest.fixture
+def uncompressed_app():
+    return create_app(testing=True, additional_config={'COMPRESSION_ENABLED': False, 'RESPONSE_CACHE_SIZE': 0})
+
+
 # Utility function to test if a response object represents a response to an invalid query
 def is_invalid(response, is_json=False):
 
@@ -104,3 +116,99 @@ def test_valid_query_viz_false_value(client):
     }
     response = client.get('/suggestions', query_string=params, follow_redirects=True)
     assert not is_invalid(response, is_json=True)
+
+
+# Verify a valid query with all facet filters
+def test_valid_query_facet_filters(client):
+    params = {
+        'q': 'Sa',
+        'country': 'ca',
+        'admin1': 'qc',
+        'min_population': 1000
+    }
+    response = client.get('/suggestions', query_string=params, follow_redirects=True)
+    assert not is_invalid(response, is_json=True)
+    assert all(suggestion['name'].endswith(', QC, CA') for suggestion in response.get_json()['suggestions'])
+
+
+# Verify the handling of invalid facet filter values
+def test_invalid_query_facet_filters(client):
+    for params in [{'q': 'Sa', 'country': 'CAN'}, {'q': 'Sa', 'admin1': 'Q-C'},
+                   {'q': 'Sa', 'min_population': 'many'}, {'q': 'Sa', 'min_population': -1}]:
+        response = client.get('/suggestions', query_string=params, follow_redirects=True)
+        assert is_invalid(response, is_json=True)
+
+
+# Verify that suggestions are gzip compressed when the client accepts it
+def test_suggestions_gzip_negotiated(client):
+    params = {'q': 'New'}
+    plain = client.get('/suggestions', query_string=params, follow_redirects=True)
+    compressed = client.get('/suggestions', query_string=params, follow_redirects=True,
+                            headers={'Accept-Encoding': 'gzip'})
+
+    assert 'Content-Encoding' not in plain.headers
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in compressed.headers['Vary']
+    assert json.loads(gzip.decompress(compressed.data)) == plain.get_json()
+
+
+# Verify that bodies smaller than the configured threshold are sent uncompressed
+def test_small_body_not_compressed(client):
+    response = client.get('/suggestions', query_string={'q': 'SomeRandomCityInTheMiddleOfNowhere'},
+                          follow_redirects=True, headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+    assert response.get_json() == {'suggestions': []}
+
+
+# Verify that templates are compressed as well
+def test_index_gzip_negotiated(client):
+    response = client.get('/', headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+
+
+# Verify that repeated queries are materialized once, along with their compressed variant
+def test_suggestions_served_from_cache(app, client):
+    params = {'q': 'New', 'latitude': 39.68372, 'longitude': -75.74966}
+    first = client.get('/suggestions', query_string=params, follow_redirects=True, headers={'Accept-Encoding': 'gzip'})
+    cache = app.extensions['response_cache']
+    entry = next(entry for key, entry in cache.entries.items() if key[:2] == ('suggestions', 'New'))
+    assert 'gzip' in entry.variants
+
+    second = client.get('/suggestions', query_string=params, follow_redirects=True, headers={'Accept-Encoding': 'gzip'})
+    assert second.data == first.data
+    assert len(cache.entries) == 1
+
+
+# Verify that compression can be disabled through the app configuration
+def test_compression_disabled(uncompressed_app):
+    response = uncompressed_app.test_client().get('/suggestions', query_string={'q': 'New'}, follow_redirects=True,
+                                                  headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+    assert len(uncompressed_app.extensions['response_cache'].entries) == 0
+
+
+# Verify that the details of a city include its extended fields
+def test_city_details(client):
+    response = client.get('/cities/6146143')
+    assert response.status_code == 200
+    city = response.get_json()
+    assert city['name'] == 'Sherbrooke, QC, CA'
+    assert city['geonameid'] == 6146143
+    for field in ['population', 'timezone', 'elevation', 'admin2', 'modification_date']:
+        assert field in city.keys()
+
+
+# Verify that an unknown city is reported as not found
+def test_city_not_found(client):
+    response = client.get('/cities/1')
+    assert response.status_code == 404
+    assert is_invalid(response, is_json=True)
+
+
+# Verify that a non-integer id is reported with the same JSON error as an unknown id
+def test_city_invalid_id(client):
+    response = client.get('/cities/abc')
+    assert response.status_code == 404
+    assert response.mimetype == 'application/json'
+    assert is_invalid(response, is_json=True)
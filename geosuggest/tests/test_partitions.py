@@ -0,0 +1,151 @@
+from geosuggest.geodb import GeoDB, PartitionedGeoDB
+from geosuggest.partition import split_by_country
+import geosuggest.geodb
+import threading
+import pytest
+import os
+
+TEST_DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test_db_data.tsv')
+
+
+# Fixture for a directory holding the test data split per country
+@pytest.fixture
+def partition_dir(tmp_path):
+    split_by_country(TEST_DATA, str(tmp_path))
+    return str(tmp_path)
+
+
+# Fixture for a partitioned db over the test data, nothing is loaded yet
+@pytest.fixture
+def partitioned_db(partition_dir):
+    return PartitionedGeoDB(partition_dir)
+
+
+# Verify that the split writes one file per country and describes them in the manifest
+def test_split_by_country(partition_dir):
+    manifest = PartitionedGeoDB.read_manifest(partition_dir)
+    assert sorted(manifest.keys()) == ['CA', 'US']
+    assert sum(description['records'] for description in manifest.values()) == 100
+    assert all(os.path.exists(os.path.join(partition_dir, description['file'])) for description in manifest.values())
+
+
+# Verify that we raise an exception when the partition directory is missing
+def test_missing_partition_dir():
+    with pytest.raises(FileNotFoundError):
+        PartitionedGeoDB('/some/missing/directory')
+
+
+# Verify that partitions are only loaded once a query needs them
+def test_partitions_loaded_on_demand(partitioned_db):
+    assert len(partitioned_db.loaded) == 0
+    candidates = partitioned_db.find_by_name('A', country='CA')
+    assert len(candidates) > 0
+    assert list(partitioned_db.loaded.keys()) == ['CA']
+
+
+# Verify that a query without any hint returns the same candidates as the single file db
+def test_partitioned_results_match_single_file(partitioned_db):
+    names = sorted(candidate.name for candidate in GeoDB(TEST_DATA).find_by_name('C'))
+    assert sorted(candidate.name for candidate in partitioned_db.find_by_name('C')) == names
+
+
+# Verify that coordinates falling inside a partition add it to the warm partitions searched
+def test_partition_selected_by_coordinates(partitioned_db):
+    partitioned_db.configure(warm_up=['US'])
+    assert partitioned_db.partitions_for() == ['US']
+    assert partitioned_db.partitions_for(latitude=45.65007, longitude=-72.56582) == ['US', 'CA']
+
+    candidates = partitioned_db.find_by_name('Acton', latitude=45.65007, longitude=-72.56582)
+    assert 'Acton Vale' in [candidate.name for candidate in candidates]
+    assert 'CA' in partitioned_db.loaded
+
+
+# Verify that cold partitions are evicted under the memory budget, while warm-up partitions are kept
+def test_partition_eviction(partitioned_db):
+    budget = max(description['bytes'] for description in partitioned_db.manifest.values())
+    partitioned_db.configure(memory_budget=budget)
+
+    partitioned_db.find_by_name('A', country='CA')
+    partitioned_db.find_by_name('A', country='US')
+    assert list(partitioned_db.loaded.keys()) == ['US']
+
+    partitioned_db.configure(memory_budget=budget, warm_up=['CA'])
+    partitioned_db.find_by_name('A', country='US')
+    assert list(partitioned_db.loaded.keys()) == ['CA', 'US']
+    partitioned_db.find_by_name('A', country='CA')
+    assert 'CA' in partitioned_db.loaded
+
+
+# Verify that an unknown country returns no candidates without loading anything
+def test_unknown_partition(partitioned_db):
+    assert partitioned_db.find_by_name('A', country='FR') == []
+    assert len(partitioned_db.loaded) == 0
+
+
+# Verify that records are found by their GeoName ID, loading only the partition holding them
+def test_partitioned_find_by_id(partitioned_db):
+    record = partitioned_db.find_by_id(5881791)
+    assert record.name == 'Abbotsford'
+    assert record.timezone == 'America/Vancouver'
+    assert list(partitioned_db.loaded.keys()) == ['CA']
+
+
+# Verify that an unknown id is not found without loading any partition, nor reading ids outside of its range
+def test_partitioned_find_by_unknown_id(partitioned_db):
+    assert partitioned_db.find_by_id(-1) is None
+    assert len(partitioned_db.partition_ids) == 0
+
+    # An id within the range of a partition is searched in its sorted ids, without loading the partition
+    description = partitioned_db.manifest['CA']
+    missing = next(geonameid for geonameid in range(description['min_id'], description['max_id'])
+                   if geonameid not in partitioned_db.ids_of('CA'))
+    assert partitioned_db.find_by_id(missing) is None
+    assert len(partitioned_db.loaded) == 0
+
+
+# Verify that the manifest only holds the id range of each partition, the ids being in a sidecar file
+def test_manifest_id_range(partition_dir):
+    manifest = PartitionedGeoDB.read_manifest(partition_dir)
+    for description in manifest.values():
+        with open(os.path.join(partition_dir, description['ids']), encoding='utf8') as file:
+            ids = [int(line) for line in file]
+        assert ids == sorted(ids)
+        assert len(ids) == description['records']
+        assert (description['min_id'], description['max_id']) == (ids[0], ids[-1])
+
+
+# Verify that records with invalid coordinates are skipped instead of aborting the split
+def test_split_skips_invalid_coordinates(tmp_path):
+    source = tmp_path / 'source.tsv'
+    with open(TEST_DATA, encoding='utf8') as file:
+        lines = file.readlines()
+    columns = lines[1].split('\t')
+    columns[4] = ''
+    source.write_text(''.join([lines[0], '\t'.join(columns)] + lines[2:]), encoding='utf8')
+
+    manifest = split_by_country(str(source), str(tmp_path / 'partitions'))
+    assert sum(description['records'] for description in manifest.values()) == 99
+
+
+# Verify that loading a cold partition does not block queries on the partitions already loaded
+def test_partition_load_does_not_block_loaded_partitions(partitioned_db, monkeypatch):
+    partitioned_db.partition('CA')
+    loading = threading.Event()
+    release = threading.Event()
+
+    def slow_geodb(*args, **kwargs):
+        loading.set()
+        release.wait(5)
+        return GeoDB(*args, **kwargs)
+
+    monkeypatch.setattr(geosuggest.geodb, 'GeoDB', slow_geodb)
+    loader = threading.Thread(target=partitioned_db.partition, args=('US',))
+    loader.start()
+    try:
+        assert loading.wait(5)
+        assert len(partitioned_db.find_by_name('A', country='CA')) > 0
+        assert 'US' not in partitioned_db.loaded
+    finally:
+        release.set()
+        loader.join()
+    assert 'US' in partitioned_db.loaded
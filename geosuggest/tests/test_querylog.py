@@ -0,0 +1,115 @@
+from geosuggest import create_app
+from geosuggest.querylog import QueryLog, format_record, parse_record, read_query_log
+from geosuggest.replay import replay, percentile, flask_client_senders, record_parameters
+import pytest
+import time
+import os
+
+
+# Fixture for an app instance logging its queries to a temporary file
+@pytest.fixture
+def logging_app(tmp_path):
+    return create_app(testing=True, additional_config={'QUERY_LOG_PATH': str(tmp_path / 'queries.log')})
+
+
+# Verify that a record survives a round trip through the log format, with and without coordinates and filters
+def test_record_round_trip():
+    assert parse_record(format_record(12.5, 'Sherbrooke', 45.40008, -71.89908)) == \
+        (12.5, 'Sherbrooke', 45.40008, -71.89908, None, None, None)
+    assert parse_record(format_record(12.5, 'Sherbrooke')) == (12.5, 'Sherbrooke', None, None, None, None, None)
+    assert parse_record(format_record(12.5, 'Sa', country='CA', admin1='QC', min_population=1000)) == \
+        (12.5, 'Sa', None, None, 'CA', 'QC', 1000)
+
+
+# Verify that lines written before the facet filters were logged still parse
+def test_parse_record_without_filters():
+    assert parse_record('12.500\tSherbrooke\t45.4\t-71.9\n') == (12.5, 'Sherbrooke', 45.4, -71.9, None, None, None)
+
+
+# Verify that the logged filters are sent again when replaying a record
+def test_record_parameters_with_filters():
+    assert record_parameters((0, 'Sa', None, None, 'CA', 'QC', 1000)) == \
+        {'q': 'Sa', 'country': 'CA', 'admin1': 'QC', 'min_population': 1000}
+    assert record_parameters((0, 'Sa', 45.4, -71.9)) == {'q': 'Sa', 'latitude': 45.4, 'longitude': -71.9}
+
+
+# Verify that whitespace which would break the log format is normalized
+def test_record_normalizes_query():
+    assert parse_record(format_record(0, ' Truth\tor \n Consequences '))[1] == 'Truth or Consequences'
+
+
+# Verify that queries are not logged unless a destination file is configured
+def test_query_log_disabled_by_default(app):
+    assert 'query_log' not in app.extensions
+
+
+# Verify that valid queries on /suggestions are appended to the log, and invalid ones are not
+def test_suggestions_are_logged(logging_app):
+    client = logging_app.test_client()
+    client.get('/suggestions', query_string={'q': 'Sherbrooke'}, follow_redirects=True)
+    client.get('/suggestions', query_string={'q': 'Toronto', 'latitude': 43.7, 'longitude': -79.4},
+               follow_redirects=True)
+    client.get('/suggestions', query_string={'q': 'Sa', 'country': 'ca', 'admin1': 'QC', 'min_population': 1000},
+               follow_redirects=True)
+    client.get('/suggestions', query_string={'latitude': 43.7}, follow_redirects=True)
+    logging_app.extensions['query_log'].close()
+
+    records = list(read_query_log(logging_app.config['QUERY_LOG_PATH']))
+    assert [record[1:] for record in records] == [('Sherbrooke', None, None, None, None, None),
+                                                  ('Toronto', 43.7, -79.4, None, None, None),
+                                                  ('Sa', None, None, 'CA', 'QC', 1000)]
+
+
+# Verify that a search term rejected by the controller is not logged
+def test_rejected_search_term_not_logged(logging_app):
+    response = logging_app.test_client().get('/suggestions', query_string={'q': '*'}, follow_redirects=True)
+    logging_app.extensions['query_log'].close()
+
+    assert response.status_code == 400
+    assert not os.path.exists(logging_app.config['QUERY_LOG_PATH'])
+
+
+# Verify that rotated files are read back oldest first
+def test_read_rotated_log(tmp_path):
+    path = str(tmp_path / 'queries.log')
+    log = QueryLog(path, max_bytes=64, backup_count=10)
+    for i in range(10):
+        log.record('Query{i}'.format(i=i), timestamp=i)
+    log.close()
+
+    assert os.path.exists(path + '.1')
+    assert [record[0] for record in read_query_log(path)] == list(range(10))
+
+
+# Verify the nearest-rank percentile
+def test_percentile():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile([], 50) is None
+
+
+# Verify that a replay through the test client sends every query and reports latencies
+def test_replay_test_client(app):
+    records = [(0, 'Sherbrooke', None, None), (0.01, 'Toronto', 43.7, -79.4), (0.02, '*', None, None)]
+    stats = replay(records, flask_client_senders(app), clients=2, speed=0)
+
+    assert stats['requests'] == 3
+    assert stats['errors'] == 1
+    assert stats['p50'] <= stats['p95'] <= stats['p99']
+
+
+# Verify that queries delayed because the client was busy count their wait in the latency, and are reported as lag
+def test_replay_slow_sender_single_client():
+    def make_sender():
+        def send(params):
+            time.sleep(0.05)
+            return 200
+        return send
+
+    records = [(i * 0.01, 'Query{i}'.format(i=i), None, None) for i in range(5)]
+    stats = replay(records, make_sender, clients=1, speed=1)
+
+    assert stats['requests'] == 5
+    assert stats['lag_max'] >= 0.15
+    assert stats['p99'] >= 0.2